@@ -1,7 +1,60 @@
 import sys
+from array import array
+from collections import defaultdict, deque
+
+# Symbols are numbered with small ints, terminals first: 'e' and '$'
+# always get ids 0 and 1. FIRST/FOLLOW sets are int bitmasks where
+# terminal t is bit 1 << t.
+EPS_ID = 0
+END_ID = 1
+EPS = 1 << EPS_ID
+END = 1 << END_ID
+# SLR table entry for accept; shifts and gotos are state numbers,
+# which stay far below it.
+ACCEPT = 2**31 - 1
+# The generated LL(1) parser tests the stack top against each
+# nonterminal in turn; past this many nonterminals the table-driven
+# predictive_parse is faster.
+GENERATED_PARSER_MAX_NTS = 8
 
 # --- STEP 1: Read the grammar from input ---
-def read_grammar():
+def input_lines():
+    """
+    All of stdin as an iterator of lines. Piped input is read in one
+    go and split; a terminal is still read line by line, so typing
+    the input by hand works as before.
+    """
+    if sys.stdin.isatty():
+        return (line.rstrip('\n') for line in sys.stdin)
+    return iter(sys.stdin.read().splitlines())
+
+
+def next_line(lines):
+    """
+    Next line from lines, stripped. Like input(), raises EOFError
+    when there is nothing left.
+    """
+    line = next(lines, None)
+    if line is None:
+        raise EOFError("EOF when reading a line")
+    return line.strip()
+
+
+def read_tests(lines):
+    """
+    Test strings up to the next blank line (or the end of input),
+    stripped.
+    """
+    tests = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            break
+        tests.append(line)
+    return tests
+
+
+def read_grammar(lines):
     """
     We read how many productions the user wants, skip any blank lines,
     then read exactly that many lines of the form:
@@ -10,7 +63,7 @@ def read_grammar():
     """
     # Keep reading until we get a non-empty line for the count
     while True:
-        line = input().strip()
+        line = next_line(lines)
         if line:
             break
     try:
@@ -21,7 +74,7 @@ def read_grammar():
     count = 0
     # Now read exactly n productions, ignoring blank lines
     while count < n:
-        line = input().strip()
+        line = next_line(lines)
         if not line:
             continue
         parts = line.split()
@@ -34,282 +87,620 @@ def read_grammar():
         count += 1
     return raw
 
-# --- STEP 2: Convert those string alternatives into lists of symbols ---
+# --- STEP 2: Convert those string alternatives into tuples of symbols ---
 def convert_to_productions(raw):
     """
     Change raw grammar: for each NT and each alt-string,
-    turn alt 'abc' into ['a','b','c'], and 'e' into ['e'] for epsilon.
+    turn alt 'abc' into ('a','b','c'), and 'e' into ('e',) for epsilon.
+    Right-hand sides are tuples, and equal ones share one tuple object.
     """
     grammar = {}
+    pool = {}
     for A, alts in raw.items():
         grammar[A] = []
         for alt in alts:
-            if alt == 'e':
-                grammar[A].append(['e'])
-            else:
-                grammar[A].append(list(alt))
+            # 'e' needs no special case: tuple('e') is already ('e',)
+            rhs = tuple(alt)
+            grammar[A].append(pool.setdefault(rhs, rhs))
     return grammar
 
+
+def number_symbols(grammar):
+    """
+    Give every symbol a small int id so the rest of the program
+    compares ints instead of strings. Terminals come first ('e' is
+    EPS_ID and '$' is END_ID), so the FIRST/FOLLOW bit of terminal t
+    is just 1 << t; the nonterminals follow in grammar order.
+    Returns sym_id[name] = id and is_nt[id] (1 for nonterminals).
+    """
+    sym_id = {'e': EPS_ID, '$': END_ID}
+    for prods in grammar.values():
+        for prod in prods:
+            for X in prod:
+                if X not in grammar and X not in sym_id:
+                    sym_id[X] = len(sym_id)
+    n_terms = len(sym_id)
+    for A in grammar:
+        sym_id[A] = len(sym_id)
+    is_nt = bytearray(i >= n_terms for i in range(len(sym_id)))
+    return sym_id, is_nt
+
+
+def encode_grammar(grammar, sym_id):
+    """
+    Rewrite the grammar with symbol ids. Productions are numbered
+    in grammar order: prods[p] is the right-hand side of production p,
+    prod_owner[p] its nonterminal, and prods_of[A] lists the
+    productions of A (empty for terminals). Right-hand sides are
+    id tuples, shared between productions that spell the same thing.
+    """
+    prods = []
+    prod_owner = array('i')
+    prods_of = [[] for _ in sym_id]
+    pool = {}
+    for A, alts in grammar.items():
+        for alt in alts:
+            rhs = tuple(sym_id[X] for X in alt)
+            prods_of[sym_id[A]].append(len(prods))
+            prods.append(pool.setdefault(rhs, rhs))
+            prod_owner.append(sym_id[A])
+    return prods, prod_owner, prods_of
+
+
+def flatten_productions(prods):
+    """
+    Lay every right-hand side end to end in one int array, so the
+    FIRST/FOLLOW loops walk one flat block of memory instead of a list
+    of lists: production p is syms[prod_start[p]:prod_end[p]].
+    """
+    syms = array('i')
+    prod_start = array('i')
+    prod_end = array('i')
+    for prod in prods:
+        prod_start.append(len(syms))
+        syms.extend(prod)
+        prod_end.append(len(syms))
+    return syms, prod_start, prod_end
+
+
+def tokenize(s, sym_id):
+    """
+    Turn a test string into symbol ids followed by '$'.
+    Characters the grammar never uses get -1, which matches nothing.
+    """
+    return [sym_id.get(c, -1) for c in s] + [END_ID]
+
 # --- STEP 3: Compute FIRST sets ---
-def first_of_string(alpha, first):
+def bits_to_ids(mask):
     """
-    Given a list of symbols alpha and precomputed first{},
-    compute FIRST(alpha) = terminals that can start alpha, or 'e'.
+    Turn a bitmask back into the list of terminal ids it contains.
     """
-    result = set()
-    for X in alpha:
-        # if X is terminal (not in first), just return that
-        if X not in first:
-            result.add(X)
-            return result
-        # else X is NT: add FIRST(X) minus epsilon
-        result |= (first[X] - {'e'})
-        if 'e' not in first[X]:
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+
+def symbol_masks(first, is_nt):
+    """
+    What each symbol X contributes inside first_of_string:
+    fmask[X] is the bits it adds and nullable[X] whether the scan
+    goes on past it. A terminal adds its own bit and stops the scan
+    (so a bare 'e' still gives EPS); a nonterminal adds FIRST(X)
+    minus epsilon and lets the scan go on if it can vanish.
+    """
+    fmask = [first[X] & ~EPS if is_nt[X] else 1 << X for X in range(len(is_nt))]
+    nullable = bytearray(1 if is_nt[X] and first[X] & EPS else 0
+                         for X in range(len(is_nt)))
+    return fmask, nullable
+
+
+def first_of_string(syms, lo, hi, fmask, nullable):
+    """
+    Given the symbols alpha = syms[lo:hi] and the symbol_masks of
+    first[], compute FIRST(alpha) = terminals that can start alpha,
+    or 'e'.
+    """
+    result = 0
+    for k in range(lo, hi):
+        X = syms[k]
+        result |= fmask[X]
+        if not nullable[X]:
             return result
     # all symbols can vanish -> epsilon
-    result.add('e')
-    return result
+    return result | EPS
+
+
+def strongly_connected(nodes, succ):
+    """
+    Tarjan's algorithm (with an explicit stack, so deep grammars
+    cannot hit the recursion limit). Returns the strongly connected
+    components of the graph nodes -> succ[node] as lists, in reverse
+    topological order: a component comes after every component it
+    has an edge to.
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(succ[root]))]
+        while work:
+            v, edges = work[-1]
+            for w in edges:
+                if w not in index:
+                    # go one level deeper, come back to v afterwards
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(succ[w])))
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        comp.append(w)
+                        if w == v:
+                            break
+                    components.append(comp)
+    return components
 
 
-def calculate_first_sets(grammar):
+def calculate_first_sets(syms, prod_start, prod_end, prod_owner, prods_of, is_nt):
     """
     Iteratively fill first[NT] for every nonterminal NT
     until no changes happen. Handles epsilon.
+    FIRST(A) only depends on the nonterminals that can start A's
+    productions, so the nonterminals are split into strongly
+    connected components of that graph and finished one component
+    at a time, dependencies first. A non-recursive nonterminal is
+    done after one pass; only recursive components iterate, and
+    there a production is only looked at again when the FIRST set
+    of some nonterminal in it grew.
+    That also means the last FIRST worked out for a production is
+    already its final one, so those are returned as well:
+    prod_firsts[p] = FIRST(syms[prod_start[p]:prod_end[p]]).
     """
-    first = {A: set() for A in grammar}
-    changed = True
-    while changed:
-        changed = False
-        for A, prods in grammar.items():
-            for prod in prods:
-                if prod == ['e']:
-                    # NT -> epsilon
-                    if 'e' not in first[A]:
-                        first[A].add('e')
-                        changed = True
-                else:
-                    temp = first_of_string(prod, first)
-                    if not temp.issubset(first[A]):
-                        first[A] |= temp
-                        changed = True
-    return first
+    first = [0] * len(is_nt)
+    fmask, nullable = symbol_masks(first, is_nt)
+    prod_firsts = [0] * len(prod_owner)
+    # For every production, the nonterminals its FIRST depends on:
+    # the ones before its first terminal (nothing after that counts)
+    uses = []
+    for lo, hi in zip(prod_start, prod_end):
+        deps = []
+        for k in range(lo, hi):
+            if not is_nt[syms[k]]:
+                break
+            deps.append(syms[k])
+        uses.append(deps)
+    nts = [A for A in range(len(is_nt)) if is_nt[A]]
+    succ = [set() for _ in is_nt]
+    for p, A in enumerate(prod_owner):
+        succ[A].update(uses[p])
+    for comp in strongly_connected(nts, succ):
+        comp_prods = [p for A in comp for p in prods_of[A]]
+        dirty = set(comp)
+        first_pass = True
+        while dirty:
+            changed = set()
+            for p in comp_prods:
+                if not first_pass and dirty.isdisjoint(uses[p]):
+                    continue
+                A = prod_owner[p]
+                # NT -> epsilon comes out as EPS here too
+                temp = first_of_string(syms, prod_start[p], prod_end[p], fmask, nullable)
+                prod_firsts[p] = temp
+                old = first[A]
+                new = old | temp
+                if new != old:
+                    first[A] = new
+                    fmask[A] = new & ~EPS
+                    nullable[A] = new & EPS
+                    changed.add(A)
+            dirty = changed
+            first_pass = False
+    return first, prod_firsts
 
 # --- STEP 4: Compute FOLLOW sets ---
-def calculate_follow_sets(grammar, first, start):
+def calculate_follow_sets(syms, prod_start, prod_end, prod_owner, is_nt,
+                          fmask, nullable, start):
     """
     Compute follow[NT] = terminals that can come after NT.
-    start gets '$'. Uses first{} and follow{} iteratively.
-    """
-    follow = {A: set() for A in grammar}
-    follow[start].add('$')
-    changed = True
-    while changed:
-        changed = False
-        for A, prods in grammar.items():
-            for prod in prods:
-                for i, B in enumerate(prod):
-                    if B in grammar:  # B is a nonterminal
-                        beta = prod[i+1:]
-                        before = len(follow[B])
-                        if beta:
-                            fb = first_of_string(beta, first)
-                            follow[B] |= (fb - {'e'})
-                            if 'e' in fb:
-                                follow[B] |= follow[A]
-                        else:
-                            follow[B] |= follow[A]
-                        if len(follow[B]) > before:
-                            changed = True
+    start gets '$'. Uses first[] (as symbol_masks).
+    One scan of the productions does all the FIRST work (first[] is
+    final here) and records which follow sets feed which: for
+    A -> ... B beta with a vanishing beta, follow[A] flows into
+    follow[B]. Nonterminals in the same strongly connected component
+    of that graph end up with the same follow set, so going through
+    the components in topological order finishes everything in one
+    pass, with no fixed point.
+    """
+    follow = [0] * len(is_nt)
+    follow[start] = END
+    feeds = [set() for _ in is_nt]    # feeds[A] = {B: follow[A] <= follow[B]}
+    for p, A in enumerate(prod_owner):
+        # Walk right to left so fb = FIRST(what comes after syms[k])
+        # grows by one symbol per step instead of being rescanned
+        fb = EPS
+        for k in range(prod_end[p] - 1, prod_start[p] - 1, -1):
+            B = syms[k]
+            if is_nt[B]:
+                follow[B] |= fb & ~EPS
+                # empty or vanishing tail -> FOLLOW(A) goes too
+                if fb & EPS and A != B:
+                    feeds[A].add(B)
+            fb = fmask[B] | (fb if nullable[B] else 0)
+    nts = [A for A in range(len(is_nt)) if is_nt[A]]
+    for comp in reversed(strongly_connected(nts, feeds)):
+        # everything flowing into comp is already in by now
+        mask = 0
+        for A in comp:
+            mask |= follow[A]
+        for A in comp:
+            follow[A] = mask
+            for B in feeds[A]:
+                follow[B] |= mask
     return follow
 
 # --- STEP 5: LL(1) Stuff ---
-def check_ll1(grammar, first, follow):
-    """
-    Check pairwise that FIRST(prodi) disjoint from FIRST(prodj),
-    and if epsilon in FIRST, its FIRST intersect FOLLOW is empty.
+def build_or_reject_ll1(prods, prods_of, prod_firsts, follow):
     """
-    for A, prods in grammar.items():
-        for i in range(len(prods)):
-            f_i = first_of_string(prods[i], first)
-            for j in range(i+1, len(prods)):
-                f_j = first_of_string(prods[j], first)
-                if f_i & f_j:
-                    return False
-            if 'e' in f_i and (f_i & follow[A]):
-                return False
-    return True
+    Check the LL(1) conditions and build the table in the same pass.
+    FIRST(prodi) must be disjoint from FIRST(prodj), and if epsilon
+    in FIRST, its FIRST intersect FOLLOW is empty; comparing each
+    FIRST with the union of the earlier ones in the row covers every
+    pair. Returns None on the first conflict.
 
-
-def build_ll1_table(grammar, first, follow):
-    """
-    Build table[A][a] = which production to use when seeing a.
+    The table is one flat int array: table[A*n + a] is the production
+    to use for A when seeing a, or -1. There is a row and a column
+    for each of the n symbols, so the parser can index it with any
+    stack top and input symbol without range checks.
+    This is where the bitmasks get decoded back into terminal ids.
+    Also returns push[p] = production p reversed (epsilon as ()),
+    which is the order the parser pushes it onto its stack.
     """
-    table = {A: {} for A in grammar}
-    for A, prods in grammar.items():
-        for prod in prods:
-            fp = first_of_string(prod, first)
-            for a in (fp - {'e'}):
-                table[A][a] = prod
-            if 'e' in fp:
-                for b in follow[A]:
-                    table[A][b] = prod
-    return table
+    n = len(follow)
+    table = array('i', [-1]) * (n * n)
+    for A, ps in enumerate(prods_of):
+        row = A * n
+        seen = 0
+        for p in ps:
+            fp = prod_firsts[p]
+            if fp & seen:
+                return None
+            seen |= fp
+            for a in bits_to_ids(fp & ~EPS):
+                table[row + a] = p
+            if fp & EPS:
+                if fp & follow[A]:
+                    return None
+                for b in bits_to_ids(follow[A]):
+                    table[row + b] = p
+    push = [() if prod == (EPS_ID,) else prod[::-1] for prod in prods]
+    return table, push
 
 # --- STEP 6: LL(1) Predictive Parser ---
-def predictive_parse(table, s, start):
+def predictive_parse(table, push, inp, start, n):
     """
-    Simulate LL(1) parse: push start, compare stack vs input,
-    apply productions from table, return True/False.
+    Simulate LL(1) parse of a tokenized string (see tokenize): push
+    start, compare stack vs input, apply productions from table,
+    return True/False. The top of the stack is the end of the list.
     """
-    stack = [start, '$']
-    inp = list(s) + ['$']
+    # a character the grammar never uses can never be matched
+    if -1 in inp:
+        return False
+    stack = [END_ID, start]
+    pop, extend = stack.pop, stack.extend
     ip = 0
     while stack:
-        top = stack.pop(0)
+        top = pop()
         cur = inp[ip]
-        if top == cur == '$':
-            return True
         if top == cur:
+            if cur == END_ID:
+                return True
             ip += 1
-        elif top in table and cur in table[top]:
-            prod = table[top][cur]
-            if prod != ['e']:
-                for sym in reversed(prod):
-                    stack.insert(0, sym)
-        else:
+            continue
+        p = table[top * n + cur]
+        if p < 0:
             return False
+        # already reversed, so the first symbol ends up on top
+        extend(push[p])
     return False
 
+
+def ll1_step(table, push, is_nt, A, a):
+    """
+    Everything the parser does with A on top of the stack and a as
+    lookahead, up to the moment a is matched: expand A, then whatever
+    nonterminal lands on top, and so on. Returns (symbols left to push,
+    whether a got matched), or None if the parse fails on the way.
+    """
+    n = len(is_nt)
+    local = [A]
+    for _ in range(4 * n):
+        if not local:
+            return (), False    # A vanished, a is still unmatched
+        top = local.pop()
+        if not is_nt[top]:
+            return (tuple(local), True) if top == a else None
+        p = table[top * n + a]
+        if p < 0:
+            return None
+        local.extend(push[p])
+    # an LL(1) grammar cannot loop here; just take the single step
+    return push[table[A * n + a]], False
+
+
+def generate_ll1_parser(table, push, is_nt, start):
+    """
+    Write the Python source of a predictive_parse specialised to this
+    grammar and compile it once. Every nonterminal becomes an if-branch
+    on the lookahead whose body does all of ll1_step at once, with the
+    symbols to push written in as constants, so parsing does no table
+    lookups at all. The returned function takes a tokenized string
+    (see tokenize) and returns True/False like predictive_parse.
+    """
+    n = len(is_nt)
+    src = [
+        "def parse(inp):",
+        "    if -1 in inp:",
+        "        return False",
+        f"    stack = [{END_ID}, {start}]",
+        "    pop, extend = stack.pop, stack.extend",
+        "    ip = 0",
+        "    cur = inp[0]",
+        "    while stack:",
+        "        top = pop()",
+        "        if top == cur:",
+        f"            if cur == {END_ID}:",
+        "                return True",
+        "            ip += 1",
+        "            cur = inp[ip]",
+    ]
+    for A in range(n):
+        if not is_nt[A]:
+            continue
+        # lookaheads that lead to the same step share one test
+        by_step = {}
+        for a in range(n):
+            if table[A * n + a] >= 0:
+                step = ll1_step(table, push, is_nt, A, a)
+                if step is not None:
+                    by_step.setdefault(step, []).append(a)
+        if not by_step:
+            continue
+        src.append(f"        elif top == {A}:")
+        keyword = "if"
+        for (rest, matched), lookaheads in by_step.items():
+            if len(lookaheads) == 1:
+                test = f"cur == {lookaheads[0]}"
+            else:
+                test = "cur in {" + ", ".join(map(str, lookaheads)) + "}"
+            body = []
+            if len(rest) == 1:
+                body.append(f"stack.append({rest[0]})")
+            elif rest:
+                body.append(f"extend({rest!r})")
+            if matched:
+                body += ["ip += 1", "cur = inp[ip]"]
+            src.append(f"            {keyword} {test}:")
+            src += ["                " + line for line in body or ["pass"]]
+            keyword = "elif"
+        src.append("            else:")
+        src.append("                return False")
+    src += [
+        "        else:",
+        "            return False",
+        "    return False",
+    ]
+    namespace = {}
+    exec(compile("\n".join(src), "<ll1 parser>", "exec"), namespace)
+    return namespace["parse"]
+
 # --- STEP 7: SLR(1) closure & states ---
-def calculate_closure(items, grammar):
+def number_items(prods):
+    """
+    Give every LR(0) item (production, dot position) a small int id:
+    the items of production p are item_base[p] + pos, one after the
+    other. item_sym[k] is the symbol right after the dot (-1 once the
+    dot is at the end) and item_prod[k] the production, so moving the
+    dot is k + 1 and everything else is one array read.
+    """
+    item_base = array('i')
+    item_sym = array('i')
+    item_prod = array('i')
+    for p, prod in enumerate(prods):
+        item_base.append(len(item_sym))
+        item_sym.extend(prod)
+        item_sym.append(-1)
+        item_prod.extend([p] * (len(prod) + 1))
+    return item_base, item_sym, item_prod
+
+
+def nonterminal_closures(item_base, prods, prods_of, is_nt):
+    """
+    For every nonterminal B, the items a dot in front of B brings
+    into a closure: the start item of every production of B and of
+    every nonterminal that can start one of those, transitively.
+    Worked out once per grammar and shared by all closures
+    (terminals get an empty set).
+    """
+    nt_closure = [frozenset()] * len(is_nt)
+    for B in range(len(is_nt)):
+        if not is_nt[B]:
+            continue
+        items = set()
+        opened = {B}
+        worklist = [B]
+        while worklist:
+            for q in prods_of[worklist.pop()]:
+                items.add(item_base[q])
+                X = prods[q][0]
+                if is_nt[X] and X not in opened:
+                    opened.add(X)
+                    worklist.append(X)
+        nt_closure[B] = frozenset(items)
+    return nt_closure
+
+
+def calculate_closure(items, item_sym, nt_closure):
     """
-    Given a set of LR(0) items, add new ones for nonterminals
-    after the dot until no more appear. Return closure.
+    Given a frozenset of LR(0) item ids, add the items of every
+    nonterminal right after a dot (those already include everything
+    they lead to), opening each nonterminal once. Return closure as a
+    frozenset, built in a single union without copying the kernel.
     """
-    closure = set(items)
-    changed = True
-    while changed:
-        changed = False
-        new = set(closure)
-        for (A, prod, i) in closure:
-            if i < len(prod) and prod[i] in grammar:
-                for beta in grammar[prod[i]]:
-                    item = (prod[i], tuple(beta), 0)
-                    if item not in new:
-                        new.add(item)
-                        changed = True
-        closure = new
-    return closure
+    opened = {item_sym[k] for k in items}
+    opened.discard(-1)
+    return items.union(*[nt_closure[X] for X in opened])
 
 
-def calculate_canonical_lr0(grammar, start):
+def calculate_canonical_lr0(items, prods, prods_of, is_nt, start):
     """
-    Build the list of all LR(0) states and transitions between them.
+    Build the list of all LR(0) states and transitions between them,
+    with items numbered by number_items.
+    States are frozensets of item ids, so equal closures always map
+    to the same index, and each state is expanded exactly once.
+    All goto kernels of a state come from one pass over its items,
+    and a kernel that was already seen maps straight to its state
+    without computing the closure again.
     """
-    init = (start, tuple(grammar[start][0]), 0)
-    states = [calculate_closure({init}, grammar)]
+    item_base, item_sym, _ = items
+    nt_closure = nonterminal_closures(item_base, prods, prods_of, is_nt)
+    init = item_base[prods_of[start][0]]
+    states = [calculate_closure(frozenset((init,)), item_sym, nt_closure)]
     trans = {}
-    idx_map = {tuple(states[0]): 0}
-    changed = True
-    while changed:
-        changed = False
-        for i, I in enumerate(list(states)):
-            symbols = {prod[pos] for (A, prod, pos) in I if pos < len(prod)}
-            for X in symbols:
-                moved = {(A, prod, pos+1) for (A, prod, pos) in I if pos < len(prod) and prod[pos] == X}
-                J = calculate_closure(moved, grammar)
-                tJ = tuple(J)
-                if tJ not in idx_map:
-                    idx_map[tJ] = len(states)
+    idx_map = {states[0]: 0}
+    kernel_map = {}    # frozenset of moved items -> state index
+    worklist = deque([0])
+    while worklist:
+        i = worklist.popleft()
+        I = states[i]
+        groups = defaultdict(list)    # symbol -> items with the dot moved over it
+        for k in I:
+            X = item_sym[k]
+            if X >= 0:
+                groups[X].append(k + 1)
+        for X, moved in groups.items():
+            moved = frozenset(moved)
+            j = kernel_map.get(moved)
+            if j is None:
+                J = calculate_closure(moved, item_sym, nt_closure)
+                j = idx_map.get(J)
+                if j is None:
+                    j = idx_map[J] = len(states)
                     states.append(J)
-                    changed = True
-                trans[(i, X)] = idx_map[tJ]
+                    worklist.append(j)
+                kernel_map[moved] = j
+            trans[(i, X)] = j
     return states, trans
 
 # --- STEP 8: Construct SLR(1) table ---
-def construct_slr_table(states, trans, grammar, follow, start):
+def construct_slr_table(states, trans, items, prod_owner, follow, start, n):
     """
     Build ACTION/GO TO table: shift, reduce, accept.
-    Returns table and production list for reduce mapping.
+    The table is one flat int array, row per state and column per
+    symbol (n of them), read as table[state*n + a]:
+    0 is an error, j > 0 shifts (or goes) to state j, -(p+1) reduces
+    by production p and ACCEPT accepts. State 0 is never a goto
+    target, so 0 is free to mean error.
     """
-    prods = []
-    pidx = {}
-    cnt = 0
-    for A, alts in grammar.items():
-        for beta in alts:
-            prods.append((A, tuple(beta)))
-            pidx[(A, tuple(beta))] = cnt
-            cnt += 1
-    table = [{} for _ in states]
+    _, item_sym, item_prod = items
+    table = array('i', bytes(4 * n * len(states)))
     for i, I in enumerate(states):
-        for (A, prod, pos) in I:
-            if pos < len(prod):
-                a = prod[pos]
+        row = i * n
+        for k in I:
+            a = item_sym[k]
+            if a >= 0:
                 if (i, a) in trans:
-                    table[i][a] = ('shift', trans[(i, a)])
+                    table[row + a] = trans[(i, a)]
             else:
+                p = item_prod[k]
+                A = prod_owner[p]
                 if A == start:
-                    table[i]['$'] = ('accept',)
+                    table[row + END_ID] = ACCEPT
                 else:
-                    ridx = pidx[(A, prod)]
-                    for a in follow[A]:
-                        table[i][a] = ('reduce', ridx)
-    return table, prods
+                    for a in bits_to_ids(follow[A]):
+                        table[row + a] = -(p + 1)
+    return table
 
 # --- STEP 9: SLR(1) Parser simulation ---
-def lr_parse(s, slr_table, productions):
+def lr_parse(inp, table, n, prod_owner, prod_len):
     """
-    Simulate SLR(1): use stack of states, read input, shift/reduce.
-    Return True if accept state reached.
+    Simulate SLR(1) on a tokenized string: use stack of states, read
+    input, shift/reduce. Return True if accept state reached.
     """
+    if -1 in inp:
+        return False
     stack = [0]
-    inp = list(s) + ['$']
+    push = stack.append
     ip = 0
     while True:
-        state = stack[-1]
-        a = inp[ip]
-        if a in slr_table[state]:
-            act = slr_table[state][a]
-            if act[0] == 'shift':
-                stack.append(act[1]); ip += 1
-            elif act[0] == 'reduce':
-                A, beta = productions[act[1]]
-                for _ in beta: stack.pop()
-                t = stack[-1]
-                stack.append(slr_table[t][A][1])
-            elif act[0] == 'accept':
+        act = table[stack[-1] * n + inp[ip]]
+        if act > 0:
+            if act == ACCEPT:
                 return True
+            push(act); ip += 1
+        elif act < 0:
+            p = -act - 1
+            del stack[-prod_len[p]:]
+            push(table[stack[-1] * n + prod_owner[p]])
         else:
             return False
         
 # --- MAIN: put it all together ---
 def main():
     # 1) Read grammar and remember original nonterminals
-    raw = read_grammar()
+    lines = input_lines()
+    raw = read_grammar(lines)
     original_NTs = list(raw.keys())
     grammar = convert_to_productions(raw)
 
     # 2) Quick productivity check (optional, omitted here)
     def productive_nts(grammar):
+        # For each production, how many distinct NTs it still waits on
+        # (terminals are productive already, so they are never looked
+        # at again), and uses[B]: the productions that mention B
+        owner, waiting = [], []
+        uses = {A: [] for A in grammar}
         productive = set()
-        # Base: any NT that has a production of only terminals or 'e'
+        worklist = deque()
         for A, alts in grammar.items():
             for prod in alts:
-                if all(sym not in grammar or sym == 'e' for sym in prod):
+                prod_nts = {sym for sym in prod if sym in grammar}
+                for B in prod_nts:
+                    uses[B].append(len(owner))
+                owner.append(A)
+                waiting.append(len(prod_nts))
+                # Base: any NT that has a production of only terminals or 'e'
+                if prod_nts <= {'e'} and A not in productive:
                     productive.add(A)
-                    break
-        # Iterate until no more NTs can be added
-        changed = True
-        while changed:
-            changed = False
-            for A, alts in grammar.items():
-                if A in productive:
-                    continue
-                for prod in alts:
-                    if all((sym not in grammar) or (sym in productive) for sym in prod):
-                        productive.add(A)
-                        changed = True
-                        break
+                    worklist.append(A)
+        # A newly productive B only counts down the productions using it
+        while worklist:
+            B = worklist.popleft()
+            for q in uses[B]:
+                waiting[q] -= 1
+                if not waiting[q] and owner[q] not in productive:
+                    productive.add(owner[q])
+                    worklist.append(owner[q])
         return productive
 
     start = next(iter(grammar))
@@ -319,20 +710,52 @@ def main():
 
     # 3) Augment grammar and compute FIRST/FOLLOW
     aug = start + "'"
-    grammar = {aug: [[start]], **grammar}
-    first = calculate_first_sets(grammar)
-    follow = calculate_follow_sets(grammar, first, aug)
+    grammar = {aug: [(start,)], **grammar}
+    sym_id, is_nt = number_symbols(grammar)
+    prods, prod_owner, prods_of = encode_grammar(grammar, sym_id)
+    syms, prod_start, prod_end = flatten_productions(prods)
+    aug_id = sym_id[aug]
+    first, prod_firsts = calculate_first_sets(syms, prod_start, prod_end,
+                                              prod_owner, prods_of, is_nt)
+    fmask, nullable = symbol_masks(first, is_nt)
+    follow = calculate_follow_sets(syms, prod_start, prod_end, prod_owner,
+                                   is_nt, fmask, nullable, aug_id)
 
     # 4) Determine which parser(s) apply
-    is_ll1 = check_ll1(grammar, first, follow)
-    if is_ll1:
-        ll1_table = build_ll1_table(grammar, first, follow)
+    ll1 = build_or_reject_ll1(prods, prods_of, prod_firsts, follow)
+    is_ll1 = ll1 is not None
+    # construct_slr_table always gives a table (on a conflict the last
+    # entry written wins), so the SLR(1) parser is always available.
+    is_slr1 = True
+
+    # Parsers are built the first time they are used, so a run that
+    # only tests with one of them never pays for the other's tables.
+    parsers = {}
+    def get_parser(kind):
+        if kind not in parsers:
+            if kind == 'T':
+                table, push = ll1
+                if sum(is_nt) <= GENERATED_PARSER_MAX_NTS:
+                    parsers[kind] = generate_ll1_parser(table, push, is_nt, aug_id)
+                else:
+                    n = len(is_nt)
+                    parsers[kind] = lambda ids: predictive_parse(table, push, ids, aug_id, n)
+            else:
+                items = number_items(prods)
+                states, trans = calculate_canonical_lr0(items, prods, prods_of,
+                                                        is_nt, aug_id)
+                n = len(is_nt)
+                table = construct_slr_table(states, trans, items, prod_owner,
+                                            follow, aug_id, n)
+                prod_len = array('i', map(len, prods))
+                parsers[kind] = lambda ids: lr_parse(ids, table, n, prod_owner, prod_len)
+        return parsers[kind]
 
-    states, trans = calculate_canonical_lr0(grammar, aug)
-    slr_res = construct_slr_table(states, trans, grammar, follow, aug)
-    is_slr1 = slr_res is not None
-    if is_slr1:
-        slr_table, slr_prods = slr_res
+    # Read one batch of test strings and answer them all in one write
+    def run_tests(kind):
+        tests = [tokenize(s, sym_id) for s in read_tests(lines)]
+        parse = get_parser(kind)
+        sys.stdout.write("".join("yes\n" if parse(ids) else "no\n" for ids in tests))
 
     # 5) Dispatch to the correct parsing mode
     # Case: neither LL(1) nor SLR(1)
@@ -343,53 +766,23 @@ def main():
     # Case: only LL(1)
     if is_ll1 and not is_slr1:
         print("Grammar is LL(1).")
-        tests = []
-        while True:
-            s = input().strip()
-            if not s:
-                break
-            tests.append(s)
-        for s in tests:
-            print("yes" if predictive_parse(ll1_table, s, aug) else "no")
+        run_tests('T')
         return
 
     # Case: only SLR(1)
     if is_slr1 and not is_ll1:
         print("Grammar is SLR(1).")
-        tests = []
-        while True:
-            s = input().strip()
-            if not s:
-                break
-            tests.append(s)
-        for s in tests:
-            print("yes" if lr_parse(s, slr_table, slr_prods) else "no")
+        run_tests('B')
         return
 
     # Case: both LL(1) and SLR(1) available
     while True:
         print("Select a parser (T: for LL(1), B: for SLR(1), Q: quit):")
-        choice = input().strip().upper()
+        choice = next_line(lines).upper()
         if choice == 'Q':
             break
-        if choice == 'T':
-            tests = []
-            while True:
-                s = input().strip()
-                if not s:
-                    break
-                tests.append(s)
-            for s in tests:
-                print("yes" if predictive_parse(ll1_table, s, aug) else "no")
-        elif choice == 'B':
-            tests = []
-            while True:
-                s = input().strip()
-                if not s:
-                    break
-                tests.append(s)
-            for s in tests:
-                print("yes" if lr_parse(s, slr_table, slr_prods) else "no")
+        if choice in ('T', 'B'):
+            run_tests(choice)
         else:
             print("Invalid choice, try T, B, or Q.")
 